@@ -1,6 +1,7 @@
 # src/cli.py
 import argparse
 import logging
+import re
 import sys
 from pathlib import Path
 from urllib.parse import urlparse
@@ -12,8 +13,16 @@ from src.utils.playwright_utils import run_browser_auth
 logger = logging.getLogger(__name__)
 
 
+# Anything but letters, digits, spaces, dashes and underscores
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w \-]+")
+
+# Value lookups for the interactive prompts
+_OUTPUT_TYPES = {e.value: e for e in OutputType}
+_MD_STRATEGIES = {e.value: e for e in MarkdownStrategy}
+
+
 def sanitize_filename(name: str) -> str:
-    return "".join([c for c in name if c.isalpha() or c.isdigit() or c in (' ', '-', '_')]).strip()
+    return _UNSAFE_FILENAME_CHARS.sub("", name).strip()
 
 
 async def interactive_auth_check():
@@ -67,27 +76,23 @@ def get_user_inputs(args: argparse.Namespace) -> RunConfig:
     # 4. Output Type
     out_type = args.output_type
     if not out_type:
-        print("Output Type Options: " + ", ".join([e.value for e in OutputType]))
+        print("Output Type Options: " + ", ".join(_OUTPUT_TYPES))
         while True:
-            val = input("Output Type: ").strip()
-            try:
-                out_type = OutputType(val)
+            out_type = _OUTPUT_TYPES.get(input("Output Type: ").strip())
+            if out_type is not None:
                 break
-            except ValueError:
-                print("Invalid output type.")
+            print("Invalid output type.")
 
     # 5. MD Strategy
     md_strat = args.md_strategy
     md_strat = MarkdownStrategy.ONLY_HTML if out_type == OutputType.PDF else md_strat
     if not md_strat:
-        print("Markdown Strategy Options: " + ", ".join([e.value for e in MarkdownStrategy]))
+        print("Markdown Strategy Options: " + ", ".join(_MD_STRATEGIES))
         while True:
-            val = input("MD Strategy: ").strip()
-            try:
-                md_strat = MarkdownStrategy(val)
+            md_strat = _MD_STRATEGIES.get(input("MD Strategy: ").strip())
+            if md_strat is not None:
                 break
-            except ValueError:
-                print("Invalid strategy.")
+            print("Invalid strategy.")
 
     # Derive a safe output name from start_url
     output_name = sanitize_filename(urlparse(start_url).netloc + urlparse(start_url).path)
@@ -103,7 +108,8 @@ def get_user_inputs(args: argparse.Namespace) -> RunConfig:
         md_strategy=md_strat,
         max_urls=args.max_urls,
         max_filesize_mb=args.max_filesize,
-        concurrency_limit=args.concurrency
+        concurrency_limit=args.concurrency,
+        max_pdfs_per_part=args.max_pdfs_per_part
     )
 
 
@@ -112,10 +118,12 @@ def parse_args():
     parser.add_argument("--start-url", help="Initial URL to crawl")
     parser.add_argument("--prefixes", nargs="+", help="Allowed URL prefixes (supports glob wildcards, e.g. *.example.com/*)")
     parser.add_argument("--output-dir", help="Output directory")
-    parser.add_argument("--output-type", choices=[e.value for e in OutputType], help="Output format")
-    parser.add_argument("--md-strategy", choices=[e.value for e in MarkdownStrategy], help="Markdown checking strategy")
+    parser.add_argument("--output-type", choices=list(_OUTPUT_TYPES), help="Output format")
+    parser.add_argument("--md-strategy", choices=list(_MD_STRATEGIES), help="Markdown checking strategy")
     parser.add_argument("--max-urls", type=int, default=500, help="Max URLs to crawl (default: 500)")
     parser.add_argument("--max-filesize", type=int, default=99, help="Max filesize per output in MB (default: 99)")
     parser.add_argument("--concurrency", type=int, default=20, help="Task concurrency limit")
+    parser.add_argument("--max-pdfs-per-part", type=int, default=50,
+                        help="Max rendered URLs (source PDFs) merged into one PDF output (default: 50)")
 
     return parser.parse_args()
\ No newline at end of file
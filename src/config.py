@@ -1,15 +1,15 @@
-from enum import Enum
+from enum import StrEnum
 from pathlib import Path
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
-class OutputType(str, Enum):
+class OutputType(StrEnum):
     PDF = "pdf"
     MARKDOWN = "md"
 
 
-class MarkdownStrategy(str, Enum):
+class MarkdownStrategy(StrEnum):
     ONLY_HTML = "only-html"
     ONLY_MD = "only-md"
     PRIORITIZE_MD = "prioritize-md"
@@ -25,6 +25,7 @@ class RunConfig(BaseModel):
     max_urls: int
     max_filesize_mb: int
     concurrency_limit: int = 10
+    max_pdfs_per_part: int = 50
 
     @property
     def max_bytes(self) -> int:
@@ -1,3 +1,4 @@
+import atexit
 import logging
 from pathlib import Path
 
@@ -40,9 +41,29 @@ LOGGING_CONFIG = {
             "formatter": "default",
             "level": logging.INFO,
         },
+        # Records are queued for a background listener thread. QueueHandler.prepare still builds the message
+        # (msg % args and exception text) on the thread that logs, only the final formatting and the tqdm
+        # write move to the listener, so writing to the terminal never blocks the event loop.
+        # Its listener has to be started after configuring, see start_log_listener.
+        "queue": {
+            "class": "logging.handlers.QueueHandler",
+            "handlers": ["tqdm"],
+            "respect_handler_level": True,
+        },
+    },
+    "loggers": {
+        # httpx logs every request at INFO, which floods the output on large crawls
+        "httpx": {"level": logging.WARNING},
     },
     "root": {
         "level": logging.INFO,
-        "handlers": ["tqdm"],
+        "handlers": ["queue"],
     },
 }
+
+
+def start_log_listener():
+    """Starts the thread behind the "queue" handler of LOGGING_CONFIG, flushing it on exit."""
+    listener = logging.getHandlerByName("queue").listener
+    listener.start()
+    atexit.register(listener.stop)
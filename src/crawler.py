@@ -1,39 +1,163 @@
 import logging
 import asyncio
-from typing import List, Set, Tuple, Optional
-from urllib.parse import urljoin, urlparse, urlunparse
+import re
+from functools import lru_cache, partial
+from typing import Callable, List, Set, Tuple, Optional
+from urllib.parse import urljoin, urlparse
 import httpx
-from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree
+from tqdm.asyncio import tqdm as async_tqdm
 
 from src.utils.async_utils import PBarConfig
-from src.utils.httpx_utils import httpx_process_urls
+from src.utils.httpx_utils import httpx_process_url
 
 import fnmatch
 
 logger = logging.getLogger(__name__)
 
+# Matches hrefs that never lead to a crawlable page
+_skip_href = re.compile(r"#|javascript:|mailto:|tel:").match
+
+_HTTP_SCHEMES = frozenset({"http", "https"})
+
+
+class _HrefTarget:
+    """lxml parser target that only records the href of <a> tags, without building a tree."""
+
+    def __init__(self):
+        self.hrefs = []
+
+    def start(self, tag, attrib):
+        if tag == "a":
+            href = attrib.get("href")
+            if href:
+                self.hrefs.append(href)
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        pass
+
+    def close(self):
+        return self.hrefs
+
+
+@lru_cache(maxsize=65536)
+def _normalize_link(base: str, href: str) -> Optional[str]:
+    """Resolves href against base, returning it without its fragment, or None if it isn't an http(s) link."""
+    full_link = urljoin(base, href)
+    # urljoin only returns absolute links here, so the scheme is everything before the first colon
+    scheme, _, rest = full_link.partition(":")
+    scheme = scheme.lower()
+    if scheme not in _HTTP_SCHEMES:
+        return None
+    # Lowercased like urlunparse would, so prefix filters and deduplication see one form
+    return f"{scheme}:{rest.split('#', 1)[0]}"
+
+
+def _link_base(url: str, origin: str, href: str) -> str:
+    """
+    Root-relative links resolve the same from any page on the host, so they are resolved
+    against the origin instead, letting them share cache entries across pages.
+    """
+    if href[0] == "/" and href[1:2] != "/":
+        return origin
+    return url
+
 
 def parse_links(content: str, url: str) -> set[str]:
     links = set()
-    soup = BeautifulSoup(content, "lxml", parse_only=SoupStrainer("a", href=True))
-    for a_tag in soup.find_all("a", href=True):
-        href = a_tag["href"].strip()
-        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
+    parser = etree.HTMLParser(target=_HrefTarget(), encoding="utf-8")
+    parser.feed(content.encode("utf-8", "replace"))
+    parsed = urlparse(url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    seen_hrefs = set()
+    for href in parser.close():
+        href = href.strip()
+        # Navigation links repeat on every page, so skip hrefs already handled on this one
+        if not href or href in seen_hrefs or _skip_href(href):
             continue
-        full_link = urljoin(url, href)
-        parsed_url = urlparse(full_link)
-        if parsed_url.scheme in ("http", "https"):
-            cleaned_url = parsed_url._replace(fragment="")
-            links.add(urlunparse(cleaned_url))
+        seen_hrefs.add(href)
+        full_link = _normalize_link(_link_base(url, origin, href), href)
+        if full_link is not None:
+            links.add(full_link)
     return links
 
 
-async def extract_links_task(response: httpx.Response) -> Tuple[str, Set[str], Optional[str]]:
+def _compile_globs(patterns: List[str]) -> Optional[Callable[[str], Optional[re.Match]]]:
+    """Compiles glob patterns into a single regex alternation and returns its match function."""
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns)).match
+
+
+def _collapse_prefixes(prefixes: List[str]) -> Tuple[str, ...]:
+    """Dedupes prefixes and drops those already covered by a shorter one, keeping the startswith tuple minimal."""
+    kept: List[str] = []
+    # Sorting puts every prefix directly before the longer prefixes it covers
+    for p in sorted(set(prefixes)):
+        if not kept or not p.startswith(kept[-1]):
+            kept.append(p)
+    return tuple(kept)
+
+
+def compile_url_filter(allowed_prefixes: List[str]) -> Callable[[str], bool]:
+    """
+    Compiles allowed_prefixes once into a URL filter. Accepts glob patterns:
+    - If a pattern contains scheme (://) it is matched against the full URL.
+    - If a pattern has no scheme, it is matched against 'netloc + path' (e.g. 'example.com/path').
+    - If a pattern contains wildcards (*, ?, [..]) it is matched as a glob, otherwise with startswith.
+
+    Plain prefixes are checked with a single startswith over a tuple, and globs with one
+    precompiled regex, instead of looping over the patterns for every URL.
+    """
+    url_prefixes, url_globs, path_prefixes, path_globs = [], [], [], []
+    for p in allowed_prefixes:
+        is_glob = any(ch in p for ch in "*?[]")
+        if "://" in p:
+            (url_globs if is_glob else url_prefixes).append(p)
+        else:
+            (path_globs if is_glob else path_prefixes).append(p)
+
+    url_prefixes, path_prefixes = _collapse_prefixes(url_prefixes), _collapse_prefixes(path_prefixes)
+    url_glob, path_glob = _compile_globs(url_globs), _compile_globs(path_globs)
+
+    def url_filter(u: str) -> bool:
+        if url_prefixes and u.startswith(url_prefixes):
+            return True
+        if url_glob and url_glob(u):
+            return True
+        if path_prefixes or path_glob:
+            parsed = urlparse(u)
+            netloc_path = f"{parsed.netloc}{parsed.path}"
+            if path_prefixes and netloc_path.startswith(path_prefixes):
+                return True
+            if path_glob and path_glob(netloc_path):
+                return True
+        return False
+
+    return url_filter
+
+
+async def extract_links_task(response: httpx.Response,
+                             max_bytes: Optional[int] = None) -> Tuple[str, Set[str], Optional[str]]:
     url = str(response.url)
     ctype = response.headers.get("content-type", "")
+    # Only read the body of HTML pages, anything else is discarded unread
     if "text/html" not in ctype:
         return url, set(), None
-    return url, parse_links(response.text, url), response.text
+
+    content_length = response.headers.get("content-length", "")
+    if max_bytes is not None and content_length.isdigit() and int(content_length) > max_bytes:
+        logger.warning(f"Skipping {url}: {content_length} bytes exceeds the limit of {max_bytes} bytes")
+        return url, set(), None
+
+    await response.aread()
+    text = response.text
+    # Parsing is CPU-bound, so it runs in a thread instead of stalling the other fetches
+    links = await asyncio.to_thread(parse_links, text, url)
+    return url, links, text
 
 
 async def run_crawler(
@@ -42,64 +166,59 @@ async def run_crawler(
         allowed_prefixes: List[str],
         max_urls: int,
         fetch_queue: asyncio.Queue,
-        limit: int = 20
+        limit: int = 20,
+        max_bytes: Optional[int] = None
 ):
     logger.info(f"Starting crawl from {start_url} (Max URLs: {max_urls})")
 
-    def url_filter(u: str) -> bool:
-        """
-        Accepts glob patterns in allowed_prefixes.
-        - If a pattern contains scheme (://) it is matched against the full URL.
-        - If a pattern has no scheme, it is matched against 'netloc + path' (e.g. 'example.com/path').
-        - If a pattern contains wildcards (*, ?, [..]) use fnmatch, otherwise use startswith.
-        """
-        parsed = urlparse(u)
-        full_url = u
-        netloc_path = f"{parsed.netloc}{parsed.path}"
-
-        for p in allowed_prefixes:
-            target = full_url if "://" in p else netloc_path
-            if any(ch in p for ch in "*?[]"):
-                if fnmatch.fnmatch(target, p):
-                    return True
-            else:
-                if target.startswith(p):
-                    return True
-        return False
+    url_filter = compile_url_filter(allowed_prefixes)
 
+    process = partial(extract_links_task, max_bytes=max_bytes)
     discovered = {start_url}
-    to_visit = {start_url}
+    to_visit: asyncio.Queue[str] = asyncio.Queue()
+    to_visit.put_nowait(start_url)
     visited_count = 0
 
     pbar_cfg = PBarConfig(desc="Crawling", unit="url", leave=True)
-
-    while to_visit and visited_count < max_urls:
-        # Grab a batch of URLs to process, up to the remaining limit
-        batch_size = min(len(to_visit), max_urls - visited_count)
-        current_batch = list(to_visit)[:batch_size]
-
-        # Remove current batch from to_visit immediately so we don't loop
-        to_visit = set(list(to_visit)[batch_size:])
-
-        results = await httpx_process_urls(
-            client=client,
-            urls=current_batch,
-            processing_func=extract_links_task,
-            limit=limit,
-            pbar=pbar_cfg
-        )
-
-        for url, links, content in results:
-            visited_count += 1
-            # Push to Fetcher Pipeline
-            if content:
-                await fetch_queue.put((url, content))
-
-            # Process new links
-            new_links = {u for u in links if url_filter(u) and u not in discovered}
-            discovered.update(new_links)
-            to_visit.update(new_links)
-
-    logger.info(f"Crawl complete. Visited {visited_count} URLs.")
-    # Signal end of crawling to the fetcher
-    await fetch_queue.put(None)
\ No newline at end of file
+    progress = async_tqdm(total=1, **pbar_cfg.model_dump())
+
+    # Workers pull from a shared frontier, so new links are fetched as soon as a free worker picks them up
+    # instead of waiting for the rest of their BFS layer. Discovery is capped at max_urls, which bounds the
+    # number of fetches too.
+    async def crawl_worker():
+        nonlocal visited_count
+        while True:
+            u = await to_visit.get()
+            try:
+                result = await httpx_process_url(client, u, process)
+                if result is None:
+                    continue
+                url, links, content = result
+                visited_count += 1
+                # Push to Fetcher Pipeline
+                if content:
+                    await fetch_queue.put((url, content))
+
+                # Process new links in a single pass, no more are needed once max_urls are discovered
+                for link in links:
+                    if len(discovered) >= max_urls:
+                        break
+                    if link in discovered or not url_filter(link):
+                        continue
+                    discovered.add(link)
+                    to_visit.put_nowait(link)
+                progress.total = len(discovered)
+            finally:
+                progress.update(1)
+                to_visit.task_done()
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            workers = [tg.create_task(crawl_worker()) for _ in range(limit or max_urls)]
+            await to_visit.join()
+            for worker in workers:
+                worker.cancel()
+    finally:
+        progress.close()
+
+    logger.info(f"Crawl complete. Visited {visited_count} URLs.")
\ No newline at end of file
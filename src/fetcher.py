@@ -1,35 +1,70 @@
 import asyncio
 import logging
 from abc import ABC, abstractmethod
+import itertools
+from collections import defaultdict
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Optional, Tuple
+from urllib.parse import urlparse
 
 import httpx
-from playwright.async_api import BrowserContext
-from bs4 import BeautifulSoup
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
 from src.config import RunConfig, OutputType, MarkdownStrategy
-from src.utils.playwright_utils import open_page
+from src.utils.playwright_utils import BrowserContextPool
 
 logger = logging.getLogger(__name__)
 
+# Site sections with this many .md misses and no hits are no longer probed.
+MD_PROBE_MAX_MISSES = 20
+
+
+def _write_text(path: Path, text: str) -> int:
+    """Writes text as UTF-8, encoding it in one go instead of through a TextIOWrapper, and returns its size."""
+    with open(path, "wb") as f:
+        return f.write(text.encode("utf-8"))
+
 
 class BaseFetcher(ABC):
     def __init__(self, config: RunConfig, temp_dir: Path):
         self.config = config
         self.temp_dir = temp_dir
+        self._file_counter = itertools.count()
+
+    def next_dest(self) -> Path:
+        """Returns a unique temporary destination (without suffix) for the next file."""
+        return self.temp_dir / f"chunk_{next(self._file_counter):05d}"
 
     @abstractmethod
-    async def handle(self, url: str, content: Optional[str], dest: Path, context: Optional[BrowserContext],
-                     client: Optional[httpx.AsyncClient]) -> Optional[Path]:
-        """Process a URL and return the path to the saved temporary file."""
+    async def handle(self, url: str, content: Optional[str], dest: Path, page: Optional[Page],
+                     client: Optional[httpx.AsyncClient]) -> Optional[Tuple[Path, int]]:
+        """Process a URL and return the path to the saved temporary file and its size in bytes."""
         pass
 
 
 class MarkdownFetcher(BaseFetcher):
-    async def handle(self, url: str, content: Optional[str], dest: Path, context: Optional[BrowserContext],
-                     client: Optional[httpx.AsyncClient]) -> Optional[Path]:
+    def __init__(self, config: RunConfig, temp_dir: Path):
+        super().__init__(config, temp_dir)
+        # .md probe outcomes per site section, used to stop probing sections that have no .md files.
+        # The fetcher is shared by all workers, and the counters are only updated between awaits.
+        self._md_hits: defaultdict[str, int] = defaultdict(int)
+        self._md_misses: defaultdict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def _probe_key(url: str) -> str:
+        """Groups URLs by host and first path segment, e.g. 'example.com/docs'."""
+        parsed = urlparse(url)
+        segments = parsed.path.strip("/").split("/")
+        return f"{parsed.netloc}/{segments[0] if len(segments) > 1 else ''}"
+
+    def _should_probe(self, key: str) -> bool:
+        return self._md_hits[key] > 0 or self._md_misses[key] < MD_PROBE_MAX_MISSES
+
+    async def handle(self, url: str, content: Optional[str], dest: Path, page: Optional[Page],
+                     client: Optional[httpx.AsyncClient]) -> Optional[Tuple[Path, int]]:
         strat = self.config.md_strategy
         out_path = dest.with_suffix(".md")
+        key = self._probe_key(url)
 
         # Helper to clean URL and add .md
         md_url = f"{url.rstrip('/')}.md"
@@ -37,57 +72,64 @@ class MarkdownFetcher(BaseFetcher):
         # 1. ONLY_HTML: Just dump the HTML we already have
         if strat == MarkdownStrategy.ONLY_HTML:
             if not content: return None
-            out_path.write_text(content, encoding="utf-8")
-            return out_path
+            size = await asyncio.to_thread(_write_text, out_path, content)
+            return out_path, size
 
         # 2. ONLY_MD: Try to fetch .md, ignore HTML content
         if strat == MarkdownStrategy.ONLY_MD:
-            if not client: return None
+            if not client or not self._should_probe(key): return None
             try:
                 resp = await client.get(md_url, timeout=3.0)
                 if resp.status_code == 200:
-                    out_path.write_text(resp.text, encoding="utf-8")
-                    return out_path
+                    self._md_hits[key] += 1
+                    size = await asyncio.to_thread(out_path.write_bytes, resp.content)
+                    return out_path, size
             except Exception:
                 pass
+            self._md_misses[key] += 1
             return None  # Failed to find MD, output nothing
 
         # 3. PRIORITIZE_MD: Try MD first, fallback to HTML
         if strat == MarkdownStrategy.PRIORITIZE_MD:
-            # Try MD fetch
-            if client:
+            # Probe with HEAD first, so a missing .md doesn't cost a full GET
+            if client and self._should_probe(key):
                 try:
-                    resp = await client.get(md_url, timeout=2.0)
-                    if resp.status_code == 200:
-                        out_path.write_text(resp.text, encoding="utf-8")
-                        return out_path
+                    head = await client.head(md_url, timeout=2.0, follow_redirects=True)
+                    if head.status_code == 200:
+                        resp = await client.get(md_url, timeout=2.0)
+                        if resp.status_code == 200:
+                            self._md_hits[key] += 1
+                            size = await asyncio.to_thread(out_path.write_bytes, resp.content)
+                            return out_path, size
                 except Exception:
                     pass
+                self._md_misses[key] += 1
 
-                    # Fallback to HTML if MD failed
+            # Fallback to HTML if MD failed
             if content:
-                out_path.write_text(content, encoding="utf-8")
-                return out_path
+                size = await asyncio.to_thread(_write_text, out_path, content)
+                return out_path, size
 
             return None
 
 
 class PdfRenderedFetcher(BaseFetcher):
-    async def handle(self, url: str, content: Optional[str], dest: Path, context: Optional[BrowserContext],
-                     client: Optional[httpx.AsyncClient]) -> Optional[Path]:
-        if not context:
-            logger.error("Browser context required for PDF Rendering")
+    async def handle(self, url: str, content: Optional[str], dest: Path, page: Optional[Page],
+                     client: Optional[httpx.AsyncClient]) -> Optional[Tuple[Path, int]]:
+        if not page:
+            logger.error("Browser page required for PDF Rendering")
             return None
 
+        # The page is reused across URLs, so failures propagate and the pool replaces it
         out_path = dest.with_suffix(".pdf")
-        async with open_page(context) as page:
-            try:
-                await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                await page.pdf(path=str(out_path), format="A4")
-                return out_path
-            except Exception as e:
-                logger.warning(f"PDF generation failed for {url}: {e}")
-                return None
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        try:
+            # Give images and stylesheets a bounded chance to load before rendering
+            await page.wait_for_load_state("load", timeout=10000)
+        except PlaywrightTimeoutError:
+            logger.debug(f"Rendering {url} before it finished loading")
+        pdf = await page.pdf(path=str(out_path), format="A4")
+        return out_path, len(pdf)
 
 
 def get_fetcher_strategy(config: RunConfig, temp_dir: Path) -> BaseFetcher:
@@ -100,14 +142,10 @@ def get_fetcher_strategy(config: RunConfig, temp_dir: Path) -> BaseFetcher:
 async def run_fetcher_worker(
         queue: asyncio.Queue,
         merge_queue: asyncio.Queue,
-        config: RunConfig,
-        temp_dir: Path,
-        context: Optional[BrowserContext],
+        fetcher: BaseFetcher,
+        contexts: Optional[BrowserContextPool],
         client: Optional[httpx.AsyncClient]
 ):
-    fetcher = get_fetcher_strategy(config, temp_dir)
-    file_counter = 0
-
     while True:
         item = await queue.get()
         if item is None:
@@ -116,15 +154,17 @@ async def run_fetcher_worker(
             break
 
         url, content = item
-        dest = temp_dir / f"chunk_{file_counter:05d}"
-        file_counter += 1
+        dest = fetcher.next_dest()
 
         try:
-            # Pass client to handle
-            path = await fetcher.handle(url, content, dest, context, client)
-            if path:
-                await merge_queue.put(path)
+            # Rendering borrows a pooled page for the duration of one URL
+            async with (contexts.acquire() if contexts else nullcontext()) as page:
+                # Pass client to handle
+                result = await fetcher.handle(url, content, dest, page, client)
+            # Paths are queued with their size, so the merger doesn't have to stat every file
+            if result:
+                await merge_queue.put(result)
         except Exception as e:
             logger.error(f"Error in fetcher for {url}: {e}")
 
-        queue.task_done()
\ No newline at end of file
+        queue.task_done()
@@ -1,21 +1,21 @@
 import asyncio
 import logging.config
 import tempfile
+from contextlib import AsyncExitStack
 from pathlib import Path
 
-import httpx
 from playwright.async_api import async_playwright
 
 from src.cli import parse_args, get_user_inputs, interactive_auth_check
 from src.config import RunConfig, OutputType
-from src.constants import LOGGING_CONFIG, STATE_FILE
-from src.utils.playwright_utils import get_browser_context
-from src.utils.httpx_utils import load_cookies_from_state
-from src.fetcher import run_fetcher_worker
+from src.constants import LOGGING_CONFIG, STATE_FILE, start_log_listener
+from src.utils.async_utils import new_event_loop
+from src.utils.playwright_utils import BrowserContextPool, get_browser, memory_bounded_pool_size
+from src.utils.httpx_utils import attach_state_cookies, make_client
+from src.fetcher import run_fetcher_worker, get_fetcher_strategy
 from src.merger import run_merger_worker
 from src.crawler import run_crawler
 
-logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
 
@@ -24,70 +24,91 @@ async def run_process(config: RunConfig):
     logger.info(f"Starting job: {config.output_name}")
 
     # 1. Setup Queues
-    fetch_queue = asyncio.Queue()
-    merge_queue = asyncio.Queue()
+    # Bounded, so the crawler stalls instead of buffering HTML when fetchers fall behind,
+    # and fetchers stall instead of piling up temp files when the merger falls behind
+    fetch_queue = asyncio.Queue(maxsize=config.concurrency_limit * 4)
+    merge_queue = asyncio.Queue(maxsize=config.concurrency_limit * 2)
 
     # 2. Setup Resources
-    cookies = load_cookies_from_state(STATE_FILE)
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safar/537.36"
     }
 
-    async with httpx.AsyncClient(cookies=cookies, follow_redirects=True, timeout=20.0, headers=headers) as client:
+    # One client is shared by the crawler and all fetchers, so every request reuses its connection pool.
+    # Both run concurrency_limit requests at a time.
+    async with make_client(headers=headers, concurrency=config.concurrency_limit * 2) as client, \
+            AsyncExitStack() as stack:
+        attach_state_cookies(client, STATE_FILE)
+
+        # Open the connection to the start host up front, so the first crawl batch reuses it
+        # instead of every request racing through DNS and the TLS handshake
+        try:
+            warmup = await client.head(config.start_url)
+            logger.debug(f"Connected to {warmup.url.host} over {warmup.http_version}")
+        except Exception as e:  # Never fails the run, e.g. httpx.InvalidURL isn't an httpx.HTTPError
+            logger.debug(f"Connection warm-up failed: {e}")
+
+        # A single browser is shared by all fetchers when PDF output is requested,
+        # with one reusable context per fetcher in the pool, as far as memory allows
+        contexts = None
+        if config.output_type == OutputType.PDF:
+            p = await stack.enter_async_context(async_playwright())
+            browser = await stack.enter_async_context(get_browser(p, headless=True))
+            contexts = await stack.enter_async_context(
+                BrowserContextPool(browser, size=memory_bounded_pool_size(config.concurrency_limit),
+                                   storage_state=STATE_FILE)
+            )
+
         with tempfile.TemporaryDirectory() as temp_dir_str:
             temp_dir = Path(temp_dir_str)
 
             # 3. Define Pipeline Tasks
-
-            # A. Crawler (Producer)
-            crawler_task = asyncio.create_task(
-                run_crawler(
-                    client=client,
-                    start_url=config.start_url,
-                    allowed_prefixes=config.allowed_prefixes,
-                    max_urls=config.max_urls,
-                    fetch_queue=fetch_queue,
-                    limit=config.concurrency_limit
+            # In a TaskGroup, so a failing stage cancels the others instead of leaving them blocked on a queue
+            async with asyncio.TaskGroup() as tg:
+                # A. Crawler (Producer)
+                crawler_task = tg.create_task(
+                    run_crawler(
+                        client=client,
+                        start_url=config.start_url,
+                        allowed_prefixes=config.allowed_prefixes,
+                        max_urls=config.max_urls,
+                        fetch_queue=fetch_queue,
+                        limit=config.concurrency_limit,
+                        max_bytes=config.max_bytes
+                    )
                 )
-            )
 
-            # B. Fetcher (Transformer)
-            # Needs Playwright context if PDF output is requested
-            async def launch_fetcher():
-                if config.output_type == OutputType.PDF:
-                    async with async_playwright() as p:
-                        async with get_browser_context(p, headless=True, storage_state=STATE_FILE) as context:
-                            # Pass 'client' here
-                            await run_fetcher_worker(fetch_queue, merge_queue, config, temp_dir, context, client)
-                else:
-                    await run_fetcher_worker(fetch_queue, merge_queue, config, temp_dir, None, client)
-
-            fetcher_tasks = [
-                asyncio.create_task(launch_fetcher())
-                for _ in range(config.concurrency_limit)
-            ]
-
-            # C. Merger (Consumer)
-            merger_task = asyncio.create_task(run_merger_worker(merge_queue, config))
-
-            # 4. Wait for pipeline completion
-            # We await the crawler first. Once it finishes, it puts None in fetch_queue.
-            await crawler_task
-            logger.info("Crawler finished. Waiting for fetcher...")
-
-            # Signal fetchers to finish
-            for _ in range(config.concurrency_limit - 1):
-                await fetch_queue.put(None)
-
-            # Fetcher sees None, finishes work, puts None in merge_queue.
-            await asyncio.gather(*fetcher_tasks)
-            logger.info("Fetcher finished. Waiting for merger...")
-
-            # Signal merger to finish
-            await merge_queue.put(None)
-
-            # Merger sees None, flushes, and exits.
-            await merger_task
+                # B. Fetcher (Transformer)
+                # One fetcher is shared by all workers, so file names and .md probe results are shared too
+                fetcher = get_fetcher_strategy(config, temp_dir)
+                fetcher_tasks = [
+                    tg.create_task(
+                        run_fetcher_worker(fetch_queue, merge_queue, fetcher, contexts, client)
+                    )
+                    for _ in range(config.concurrency_limit)
+                ]
+
+                # C. Merger (Consumer)
+                merger_task = tg.create_task(run_merger_worker(merge_queue, config))
+
+                # 4. Wait for pipeline completion
+                # We await the crawler first.
+                await crawler_task
+                logger.info("Crawler finished. Waiting for fetcher...")
+
+                # Signal fetchers to finish, one None per worker
+                for _ in fetcher_tasks:
+                    await fetch_queue.put(None)
+
+                # Fetcher sees None, finishes work, puts None in merge_queue.
+                await asyncio.gather(*fetcher_tasks)
+                logger.info("Fetcher finished. Waiting for merger...")
+
+                # Signal merger to finish
+                await merge_queue.put(None)
+
+                # Merger sees None, flushes, and exits.
+                await merger_task
             logger.info("Merger finished. Job Complete.")
 async def main():
     # Parse CLI Flags
@@ -110,4 +131,7 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # Configured here rather than on import, since the spawned merge workers re-import this module
+    logging.config.dictConfig(LOGGING_CONFIG)
+    start_log_listener()
+    asyncio.run(main(), loop_factory=new_event_loop)
\ No newline at end of file
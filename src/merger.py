@@ -1,14 +1,128 @@
 import asyncio
+import errno
 import logging
+import mmap
+import multiprocessing
+import os
+import shutil
+import subprocess
 from abc import ABC, abstractmethod
+from collections.abc import Buffer
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Tuple, Union
+
+from pypdf import PdfReader, PdfWriter
+
+try:
+    import pikepdf
+except ImportError:  # pikepdf is optional, merging falls back to pypdf
+    pikepdf = None
 
-from pypdf import PdfWriter
 from src.config import RunConfig, OutputType
 
 logger = logging.getLogger(__name__)
 
+# Buffers per writev call, the limit on most platforms.
+_IOV_MAX = 1024
+
+# Source files mapped at once while flushing a text part, each map holds a file descriptor.
+_MAX_OPEN_MAPS = 64
+
+# qpdf is optional, PDFs are merged with it when it is on the PATH.
+QPDF = shutil.which("qpdf")
+
+
+def merge_pdfs_pypdf(paths: List[Path], out_path: Path):
+    """Merges PDFs with pypdf, keeping only one source reader alive at a time."""
+    writer = PdfWriter()
+    for f_path in paths:
+        # The reader's pages are copied into the writer, then closing it drops its parsed object cache,
+        # so peak memory is the output plus one source rather than every source at once
+        try:
+            with PdfReader(f_path, strict=False) as reader:
+                writer.append_pages_from_reader(reader)
+        except Exception as e:
+            logger.error(f"Error appending PDF {f_path}: {e}")
+
+    with open(out_path, "wb") as f:
+        writer.write(f)
+
+
+def merge_pdfs_pikepdf(paths: List[Path], out_path: Path):
+    """Merges PDFs with pikepdf, which copies the page trees natively in QPDF."""
+    with pikepdf.Pdf.new() as writer, ExitStack() as sources:
+        for f_path in paths:
+            try:
+                # Sources stay open until the output is saved, QPDF copies stream data lazily
+                src = sources.enter_context(pikepdf.Pdf.open(f_path))
+                writer.pages.extend(src.pages)
+            except Exception as e:
+                logger.error(f"Error appending PDF {f_path}: {e}")
+
+        writer.save(out_path)
+
+
+def merge_pdfs_qpdf(paths: List[Path], out_path: Path):
+    """Merges PDFs with the qpdf binary, which concatenates pages natively without rewriting them."""
+    cmd = [QPDF, "--empty", "--pages", *map(str, paths), "--", str(out_path)]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    # Exit code 3 means qpdf succeeded with warnings, e.g. for slightly damaged sources
+    if result.returncode not in (0, 3):
+        # A single unreadable source fails the whole qpdf run, so the part is merged again
+        # with a backend that skips the sources it can't read
+        fallback = merge_pdfs_pikepdf if pikepdf is not None else merge_pdfs_pypdf
+        logger.warning(f"qpdf exited with {result.returncode} for {out_path}, "
+                       f"retrying with {fallback.__name__}: {result.stderr.strip()}")
+        fallback(paths, out_path)
+
+
+def get_pdf_merge() -> Callable[[List[Path], Path], None]:
+    """Returns the fastest available PDF merge: qpdf, then pikepdf, then pypdf."""
+    if QPDF is not None:
+        return merge_pdfs_qpdf
+    if pikepdf is not None:
+        return merge_pdfs_pikepdf
+    return merge_pdfs_pypdf
+
+
+def _map_file(path: Path) -> Union[mmap.mmap, bytes]:
+    """Maps a file read-only, so its contents are written out straight from the page cache."""
+    with path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""  # Empty files cannot be mapped
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_all(fd: int, bufs: List[Buffer]):
+    """Writes all buffers to fd, with a single writev per _IOV_MAX buffers where it is available."""
+    views = [memoryview(b) for b in bufs if b]
+    if not hasattr(os, "writev"):  # Windows
+        for view in views:
+            while view:
+                view = view[os.write(fd, view):]
+        return
+
+    i = 0
+    while i < len(views):
+        written = os.writev(fd, views[i:i + _IOV_MAX])
+        # Skip the buffers that were written completely and trim a partially written one
+        while i < len(views) and written >= len(views[i]):
+            written -= len(views[i])
+            i += 1
+        if written:
+            views[i] = views[i][written:]
+
+
+def _log_merge_result(out_path: Path, future: Future):
+    try:
+        future.result()
+        logger.info(f"Saved: {out_path}")
+    except Exception as e:
+        logger.error(f"Failed to write PDF {out_path}: {e}")
+
 
 class BaseMerger(ABC):
     def __init__(self, config: RunConfig):
@@ -19,10 +133,15 @@ class BaseMerger(ABC):
         self.buffer = []
 
     @abstractmethod
-    def add(self, file_path: Path):
-        """Add a file to the merge buffer."""
+    def add(self, file_path: Path, f_size: int):
+        """Add a file of f_size bytes to the merge buffer."""
         pass
 
+    def add_batch(self, items: List[Tuple[Path, int]]):
+        """Adds (path, size) files in order, filling each part up to the limit before starting the next."""
+        for file_path, f_size in items:
+            self.add(file_path, f_size)
+
     @abstractmethod
     def flush(self):
         """Write current buffer to disk."""
@@ -38,30 +157,55 @@ class TextMerger(BaseMerger):
     def __init__(self, config: RunConfig, ext: str):
         super().__init__(config)
         self.ext = ext
-        self.separator = "\n\n" + "=" * 40 + "\n\n"
-        self.sep_size = len(self.separator.encode('utf-8'))
+        self.separator = ("\n\n" + "=" * 40 + "\n\n").encode('utf-8')
+        self.sep_size = len(self.separator)
 
-    def add(self, file_path: Path):
-        try:
-            f_size = file_path.stat().st_size
-            # Check limit
-            if self.buffer_size + f_size + self.sep_size > self.config.max_bytes:
-                self.flush()
+    def add(self, file_path: Path, f_size: int):
+        # Check limit
+        if self.buffer and self.buffer_size + f_size + self.sep_size > self.config.max_bytes:
+            self.flush()
 
-            text = file_path.read_text(encoding="utf-8")
-            self.buffer.append(text)
-            self.buffer_size += f_size + self.sep_size
-        except Exception as e:
-            logger.error(f"Error reading {file_path}: {e}")
+        # Only the path is buffered, the content is copied over when flushing
+        self.buffer.append(file_path)
+        self.buffer_size += f_size + self.sep_size
 
     def flush(self):
         fname = f"{self.config.output_name}_part{self.part_num}{self.ext}"
         out_path = self.config.output_dir / fname
         try:
-            with out_path.open("w", encoding="utf-8") as f:
-                for content in self.buffer:
-                    f.write(content)
-                    f.write(self.separator)
+            # The parts are already UTF-8, so they are mapped and written as bytes without decoding,
+            # handing the kernel up to _IOV_MAX buffers per syscall
+            fd = os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                with ExitStack() as maps:
+                    bufs = []
+                    mapped = 0
+                    for file_path in self.buffer:
+                        try:
+                            source = _map_file(file_path)
+                        except OSError as e:
+                            if e.errno not in (errno.EMFILE, errno.ENFILE):
+                                logger.error(f"Error reading {file_path}: {e}")
+                                continue
+                            # Out of file descriptors, write out and release the open maps, then retry once
+                            _write_all(fd, bufs)
+                            bufs = []
+                            mapped = 0
+                            maps.close()
+                            source = _map_file(file_path)
+                        if isinstance(source, mmap.mmap):
+                            maps.enter_context(source)
+                            mapped += 1
+                        bufs.extend((source, self.separator))
+                        # Only a few maps are kept open, so a large part doesn't exhaust the descriptor limit
+                        if mapped >= _MAX_OPEN_MAPS or len(bufs) >= _IOV_MAX:
+                            _write_all(fd, bufs)
+                            bufs = []
+                            mapped = 0
+                            maps.close()
+                    _write_all(fd, bufs)
+            finally:
+                os.close(fd)
             logger.info(f"Saved: {out_path}")
         except Exception as e:
             logger.error(f"Failed to write {out_path}: {e}")
@@ -73,11 +217,18 @@ class TextMerger(BaseMerger):
 
 
 class PdfMerger(BaseMerger):
-    def add(self, file_path: Path):
+    def __init__(self, config: RunConfig):
+        super().__init__(config)
+        self.merge = get_pdf_merge()
+        logger.debug(f"Merging PDFs with {self.merge.__name__}")
+        # Merging is CPU-bound, so parts are merged in worker processes, in parallel with each other
+        self.pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+
+    def add(self, file_path: Path, f_size: int):
         try:
-            f_size = file_path.stat().st_size
             # Limit by size OR count (PDF merging is memory intensive)
-            if (self.buffer_size + f_size > self.config.max_bytes) or (len(self.buffer) >= 50):
+            if self.buffer and (self.buffer_size + f_size > self.config.max_bytes
+                                or len(self.buffer) >= self.config.max_pdfs_per_part):
                 self.flush()
 
             self.buffer.append(file_path)
@@ -86,26 +237,20 @@ class PdfMerger(BaseMerger):
             logger.error(f"Error preparing PDF {file_path}: {e}")
 
     def flush(self):
-        writer = PdfWriter()
-        for f_path in self.buffer:
-            try:
-                writer.append(f_path)
-            except Exception as e:
-                logger.error(f"Error appending PDF {f_path}: {e}")
-
         fname = f"{self.config.output_name}_part{self.part_num}.pdf"
         out_path = self.config.output_dir / fname
-        try:
-            with open(out_path, "wb") as f:
-                writer.write(f)
-            logger.info(f"Saved: {out_path}")
-        except Exception as e:
-            logger.error(f"Failed to write PDF {out_path}: {e}")
+        future = self.pool.submit(self.merge, self.buffer, out_path)
+        future.add_done_callback(partial(_log_merge_result, out_path))
 
         self.buffer = []
         self.buffer_size = 0
         self.part_num += 1
 
+    def close(self):
+        """Final flush, then wait for all parts to be merged."""
+        super().close()
+        self.pool.shutdown(wait=True)
+
 
 def get_merger(config: RunConfig) -> BaseMerger:
     if config.output_type == OutputType.PDF:
@@ -116,12 +261,21 @@ def get_merger(config: RunConfig) -> BaseMerger:
 
 async def run_merger_worker(queue: asyncio.Queue, config: RunConfig):
     merger = get_merger(config)
+    # Mergers do blocking file I/O, so they run in a thread to keep the event loop free.
+    # Files that are already queued are handed over together, without waiting for more to arrive
     while True:
-        path = await queue.get()
-        if path is None:
-            merger.close()
+        batch = [await queue.get()]
+        while batch[-1] is not None and not queue.empty():
+            batch.append(queue.get_nowait())
+
+        done = batch[-1] is None
+        items = batch[:-1] if done else batch
+        if items:
+            await asyncio.to_thread(merger.add_batch, items)
+        if done:
+            await asyncio.to_thread(merger.close)
+
+        for _ in batch:
             queue.task_done()
+        if done:
             break
-
-        merger.add(path)
-        queue.task_done()
\ No newline at end of file
@@ -2,55 +2,115 @@
 
 import asyncio
 import logging
-from typing import List, TypeVar, Coroutine, Any, Optional
+from typing import List, TypeVar, Any, Optional, Callable, Awaitable, Iterable, AsyncIterable, AsyncIterator, Sized, \
+    Union
 
 from pydantic import BaseModel
 from tqdm.asyncio import tqdm as async_tqdm
 
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
+TaskFactory = Callable[[], Awaitable[T]]
+TaskFactories = Union[Iterable[TaskFactory[T]], AsyncIterable[TaskFactory[T]]]
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Creates the event loop used by the entrypoints.
+
+    Uses uvloop when it is installed, falling back to the default asyncio loop.
+    Tasks are created eagerly, so coroutines that finish without suspending skip the
+    scheduler round-trip entirely.
+    """
+    loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    loop.set_task_factory(asyncio.eager_task_factory)
+    return loop
+
+
 class PBarConfig(BaseModel):
     """A typed configuration for tqdm progress bars."""
     desc: str
     unit: str
     leave: bool = False
 
-def limit_conc(tasks: List[Coroutine[Any, Any, T]], limit: int) -> List[Coroutine[Any, Any, T]]:
-    """Wraps a list of tasks using the same semaphore with a specified limit."""
-    semaphore = asyncio.Semaphore(limit)
 
-    async def worker(task: Coroutine[Any, Any, T]) -> T:
-        """Wrapper to acquire semaphore before running a task."""
-        async with semaphore:
-            return await task
+async def _iter_factories(factories: TaskFactories[T]) -> AsyncIterator[TaskFactory[T]]:
+    """Iterates over a sync or async iterable of task factories."""
+    if isinstance(factories, AsyncIterable):
+        async for factory in factories:
+            yield factory
+    else:
+        for factory in factories:
+            yield factory
+
+
+async def _worker(queue: asyncio.Queue, results: List[Any], progress: Optional[async_tqdm]):
+    """Long-lived worker that runs queued factories and stores each result at its index."""
+    while True:
+        idx, factory = await queue.get()
+        try:
+            results[idx] = await factory()
+        finally:
+            if progress is not None:
+                progress.update(1)
+            queue.task_done()
 
-    return [worker(task) for task in tasks]
 
 async def run_async_tasks(
-        tasks: List[Coroutine[Any, Any, T]],
+        factories: TaskFactories[T],
         limit: int = 0,
         pbar: Optional[PBarConfig] = None,
 ) -> List[T]:
     """
-    Runs a list of awaitable tasks concurrently with a specified concurrency limit.
+    Runs coroutine factories concurrently with a specified concurrency limit.
+
+    With a limit, exactly `limit` workers pull factories from a bounded queue, so only
+    `limit` coroutines exist at any time. Results are returned in input order.
     """
     if limit < 0:
         raise ValueError('limit must non-negative')
 
-    if not tasks:
+    total = len(factories) if isinstance(factories, Sized) else None
+    if total == 0:
         return []
 
-    if limit > 0:
-        tasks = limit_conc(tasks, limit)
-        logger.info(f"Running {len(tasks)} tasks with a concurrency limit of {limit}...")
-    else:
-        logger.info(f"Running {len(tasks)} tasks concurrently...")
+    # Nothing to limit when every task fits under the limit, so skip the worker pool
+    if limit == 0 or (total is not None and limit >= total):
+        tasks = [factory() async for factory in _iter_factories(factories)]
+        logger.debug(f"Running {len(tasks)} tasks concurrently...")
+        if pbar is None:
+            return await asyncio.gather(*tasks)
+
+        kwargs = pbar.model_dump()
+        kwargs["total"] = len(tasks)
+        return await async_tqdm.gather(*tasks, **kwargs)
+
+    logger.debug(f"Running {total if total is not None else 'streamed'} tasks with a concurrency limit of {limit}...")
+    results: List[Any] = []
+    queue = asyncio.Queue(maxsize=limit * 2)
+    progress = async_tqdm(total=total, **pbar.model_dump()) if pbar is not None else None
+    try:
+        async with asyncio.TaskGroup() as tg:
+            workers = [tg.create_task(_worker(queue, results, progress)) for _ in range(limit)]
+            async for factory in _iter_factories(factories):
+                results.append(None)
+                await queue.put((len(results) - 1, factory))
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+    except ExceptionGroup as eg:
+        # Raise the failing task's own exception, as the gather path does
+        raise eg.exceptions[0]
+    finally:
+        if progress is not None:
+            progress.close()
 
-    if pbar is None:
-        return await asyncio.gather(*tasks)
+    return results
 
-    kwargs = pbar.model_dump()
-    kwargs["total"] = len(tasks)
-    return await async_tqdm.gather(*tasks, **kwargs)
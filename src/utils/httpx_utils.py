@@ -1,104 +1,166 @@
 # src/processors.py
 
 import logging
-from typing import List, Callable, Coroutine, Any, TypeVar, Optional
+from types import MappingProxyType
+from typing import Callable, Coroutine, Any, TypeVar, Optional, Mapping
 import json
+from http.cookiejar import Cookie, CookieJar
 
 import httpx
-from httpx import AsyncClient, Response, HTTPStatusError
+from httpx import AsyncClient, Response
 from pathlib import Path
 
-from src.utils.async_utils import run_async_tasks, PBarConfig
+try:
+    import orjson
+except ImportError:  # orjson is optional, state files are parsed with json instead
+    orjson = None
 
 logger = logging.getLogger(__name__)
 T = TypeVar('T')
 
+# Built once instead of httpx converting a float on every request. Callers wanting a single value
+# for every phase can pass e.g. httpx.Timeout(10.0).
+DEFAULT_TIMEOUT = httpx.Timeout(20.0, connect=5.0, write=10.0, pool=5.0)
 
-def load_cookies_from_state(state_file: Path) -> Optional[httpx.Cookies]:
-    """
-    Loads cookies from a Playwright state.json file and converts them
-    into an httpx.Cookies object.
-    """
-    if not state_file.exists():
-        logger.warning(f"State file not found: {state_file}")
-        return None
+# Options httpx_process_url requests with when the caller passes none. Read-only, as it's shared by all calls.
+DEFAULT_REQUEST_OPTIONS: Mapping[str, Any] = MappingProxyType({"timeout": DEFAULT_TIMEOUT, "follow_redirects": True})
+
+# Cookie lists parsed from state files, keyed by path and modification time.
+_STATE_COOKIES_CACHE: dict[tuple[str, int], list] = {}
+
+
+def _to_cookie(cookie: dict) -> Cookie:
+    """Converts a Playwright state cookie directly into a cookiejar Cookie, keeping its secure flag and expiry."""
+    domain = cookie['domain']
+    expires = cookie.get('expires', -1)
+    return Cookie(
+        version=0, name=cookie['name'], value=cookie['value'],
+        port=None, port_specified=False,
+        domain=domain, domain_specified=bool(domain), domain_initial_dot=domain.startswith('.'),
+        path=cookie['path'], path_specified=True,
+        secure=cookie.get('secure', False),
+        # Playwright marks session cookies with an expiry of -1
+        expires=int(expires) if expires is not None and expires >= 0 else None,
+        discard=False, comment=None, comment_url=None,
+        rest={"HttpOnly": None} if cookie.get('httpOnly') else {},
+    )
 
-    logger.info(f"Loading cookies from state file: {state_file}")
+
+def _read_state_cookies(state_file: Path) -> Optional[list]:
+    """Returns the cookies of a Playwright state.json file, or None if there are none to load."""
     try:
-        with open(state_file, 'r') as f:
-            state = json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to read or parse state file {state_file}: {e}")
+        mtime_ns = state_file.stat().st_mtime_ns
+    except FileNotFoundError:
+        logger.warning(f"State file not found: {state_file}")
         return None
 
-    if "cookies" not in state or not state["cookies"]:
+    # The file is only parsed again once it has changed, e.g. after re-authenticating
+    key = (str(state_file), mtime_ns)
+    state_cookies = _STATE_COOKIES_CACHE.get(key)
+    if state_cookies is None:
+        logger.info(f"Loading cookies from state file: {state_file}")
+        try:
+            with open(state_file, 'rb') as f:
+                data = f.read()
+            state = orjson.loads(data) if orjson is not None else json.loads(data)
+        except Exception as e:
+            logger.error(f"Failed to read or parse state file {state_file}: {e}")
+            return None
+        state_cookies = _STATE_COOKIES_CACHE[key] = state.get("cookies") or []
+
+    if not state_cookies:
         logger.warning(f"No cookies found in state file: {state_file}")
         return None
+    return state_cookies
 
-    cookies = httpx.Cookies()
-    for cookie in state["cookies"]:
-        # The Playwright cookie format maps directly
-        cookies.set(
-            name=cookie['name'],
-            value=cookie['value'],
-            domain=cookie['domain'],
-            path=cookie['path'],
-        )
+
+def load_cookies_from_state(state_file: Path) -> Optional[httpx.Cookies]:
+    """
+    Loads cookies from a Playwright state.json file and converts them
+    into an httpx.Cookies object.
+    """
+    state_cookies = _read_state_cookies(state_file)
+    if state_cookies is None:
+        return None
+
+    # A fresh jar per call, since clients keep and update the jar they are given
+    jar = CookieJar()
+    for cookie in state_cookies:
+        jar.set_cookie(_to_cookie(cookie))
+    cookies = httpx.Cookies(jar)
 
     logger.info(f"Successfully loaded {len(cookies)} cookies.")
     return cookies
 
+
+def attach_state_cookies(client: AsyncClient, state_file: Path) -> int:
+    """
+    Loads cookies from a Playwright state.json file straight into the client's own jar,
+    without building an intermediate httpx.Cookies. Returns the number of cookies added.
+    """
+    state_cookies = _read_state_cookies(state_file)
+    if state_cookies is None:
+        return 0
+
+    jar = client.cookies.jar
+    for cookie in state_cookies:
+        jar.set_cookie(_to_cookie(cookie))
+
+    logger.info(f"Successfully loaded {len(state_cookies)} cookies.")
+    return len(state_cookies)
+
+def make_client(
+        cookies: Optional[httpx.Cookies] = None,
+        headers: Optional[dict] = None,
+        concurrency: int = 20,
+) -> AsyncClient:
+    """
+    Creates an HTTP/2 client sized for `concurrency` requests in flight at a time.
+
+    With HTTP/2 requests to a host multiplex over a single connection; HTTP/1.1-only
+    hosts get up to `concurrency` connections, half of which are kept alive.
+    """
+    limits = httpx.Limits(
+        max_keepalive_connections=max(1, concurrency // 2),
+        max_connections=concurrency,
+        keepalive_expiry=30.0,
+    )
+    # Retry failed connection attempts once, so a dropped handshake doesn't lose the page
+    transport = httpx.AsyncHTTPTransport(http2=True, limits=limits, retries=1)
+    return AsyncClient(cookies=cookies, headers=headers, follow_redirects=True, timeout=DEFAULT_TIMEOUT,
+                       transport=transport)
+
 async def httpx_process_url(
         client: AsyncClient,
         url: str,
         processing_func: Callable[[Response], Coroutine[Any, Any, T]],
-        request_options: Optional[dict] = None,
+        request_options: Optional[Mapping[str, Any]] = None,
 ) -> Optional[T]:
     """
     Internal worker task for processing a single URL with HTTPX.
     Fetches the URL and applies the processing_func to the response.
+
+    The response is streamed: its body has not been read when processing_func
+    is called, so it must `await response.aread()` before accessing the content.
+    Responses it doesn't need can be skipped without ever downloading the body.
     """
     logger.debug(f"Processing (HTTPX): {url}")
     # Default options if none are provided
     if request_options is None:
-        request_options = {"timeout": 20.0, "follow_redirects": True}
+        request_options = DEFAULT_REQUEST_OPTIONS
 
     try:
-        response = await client.get(url, **request_options)
-        response.raise_for_status()  # Raise an exception for 4xx/5xx
-
-        # The provided async function does the actual work
-        return await processing_func(response)
-    except HTTPStatusError as e:
-        logger.error(f"HTTP error {e.response.status_code} for {url}")
-        return None
+        async with client.stream("GET", url, **request_options) as response:
+            # Checked directly instead of through raise_for_status, crawls routinely hit 404s
+            if response.is_error:
+                logger.error(f"HTTP error {response.status_code} for {url}")
+                return None
+
+            # The provided async function does the actual work
+            return await processing_func(response)
     except httpx.RequestError as e:
         logger.error(f"HTTPX request error for {url}: {e}")
         return None
     except Exception as e:
         logger.error(f"Unexpected error processing {url}: {e}")
         return None
-
-async def httpx_process_urls(
-        client: AsyncClient,
-        urls: List[str],
-        processing_func: Callable[[Response], Coroutine[Any, Any, T]],
-        limit: int = 0,
-        pbar: Optional[PBarConfig] = None,
-        request_options: Optional[dict] = None
-) -> List[T]:
-    """
-    Given a list of links, loads them with HTTPX and applies
-    an async function to the individual Response object.
-    """
-    if not urls:
-        return []
-
-    tasks = [
-        httpx_process_url(client, url, processing_func, request_options)
-        for url in urls
-    ]
-
-    results = await run_async_tasks(tasks, limit, pbar)
-
-    return [res for res in results if res is not None]
\ No newline at end of file
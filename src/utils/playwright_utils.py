@@ -2,18 +2,66 @@ import asyncio
 import logging
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, AsyncGenerator, Optional
+from functools import partial
+from typing import AsyncGenerator, Collection, Optional, Set, Tuple
 
-from playwright.async_api import Playwright, async_playwright, BrowserContext, Page
+from playwright.async_api import Playwright, async_playwright, Browser, BrowserContext, Page, Route
 
 from src.constants import STATE_FILE
+from src.utils.async_utils import new_event_loop
 
 logger = logging.getLogger(__name__)
 
+# Pooled contexts are recycled after this many pages to bound browser memory.
+CONTEXT_MAX_PAGES = 50
+
+# Chromium features a headless renderer doesn't need. The sandbox and zygote are kept, pages are untrusted.
+HEADLESS_CHROMIUM_ARGS = [
+    "--disable-dev-shm-usage",  # /dev/shm is tiny in containers, use /tmp instead
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-renderer-backgrounding",  # Pooled pages render concurrently, none of them is "in the background"
+]
+
+# Rough memory a rendering Chromium page needs, used to size the context pool.
+PAGE_COST_MB = 150
+
+# Requests that don't affect a rendered page. Images and stylesheets are kept for PDF fidelity.
+BLOCKED_RESOURCE_TYPES = frozenset({"font", "media", "beacon", "websocket", "csp_report", "other"})
+
+def resolve_storage_state(storage_state: Optional[Path]) -> Optional[Path]:
+    """Returns the storage state file to load, or None if there is nothing to load."""
+    if storage_state is None:
+        logger.info("Creating context without storage state")
+        return None
+    if storage_state.exists():
+        logger.info(f"Loading state from {storage_state}")
+        return storage_state
+    logger.info(f"Could not find storage state {storage_state}")
+    return None
+
+@asynccontextmanager
+async def get_browser(p: Playwright, headless: bool) -> AsyncGenerator[Browser, None]:
+    """
+    An async context manager to provide a Playwright browser.
+
+    The browser is launched once and should be shared, creating cheap
+    contexts per job instead of launching a new browser.
+    """
+    logger.info(f"Launching browser.")
+    browser = await p.chromium.launch(headless=headless, args=HEADLESS_CHROMIUM_ARGS if headless else None)
+    logger.info("Browser is ready.")
+    try:
+        yield browser
+    finally:
+        logger.info("Closing browser...")
+        await browser.close()
+        logger.info("Browser closed.")
+
 @asynccontextmanager
-async def get_browser_context(
-    p: Playwright,
-    headless: bool,
+async def get_context(
+    browser: Browser,
     storage_state: Optional[Path] = None,
     save_on_exit: bool = False,
 ) -> AsyncGenerator[BrowserContext, None]:
@@ -23,15 +71,7 @@ async def get_browser_context(
     It loads authentication state from a file if it exists, and can save
     the state back to the file upon exit.
     """
-    # Validate storage state parameters
-    load_storage_state = None
-    if storage_state is None:
-        logger.info("Creating context without storage state")
-    elif storage_state.exists():
-        logger.info(f"Loading state from {storage_state}")
-        load_storage_state = storage_state
-    else:
-        logger.info(f"Could not find storage state {storage_state}")
+    load_storage_state = resolve_storage_state(storage_state)
 
     save_storage_state = None
     if save_on_exit and storage_state is not None:
@@ -39,11 +79,7 @@ async def get_browser_context(
     elif save_on_exit and storage_state is None:
         logger.warning("save_on_exit is True, but storage_state is None")
 
-    # Launch browser and get context
-    logger.info(f"Launching browser.")
-    browser = await p.chromium.launch(headless=headless)
     context = await browser.new_context(storage_state=load_storage_state)
-    logger.info("Browser is ready.")
     try:
         yield context
     finally:
@@ -52,28 +88,155 @@ async def get_browser_context(
             storage_state.parent.mkdir(parents=True, exist_ok=True)
             await context.storage_state(path=save_storage_state)
             logger.info("State saved successfully.")
-        logger.info("Closing browser...")
         await context.close()
-        await browser.close()
-        logger.info("Browser closed.")
 
-@asynccontextmanager
-async def open_page(context: BrowserContext) -> AsyncGenerator[Page, Any]:
+# cgroup (v2, then v1) files with the memory limit and current usage of a container.
+_CGROUP_MEMORY_FILES = [
+    ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+    ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes"),
+]
+
+def _meminfo_available() -> Optional[int]:
+    """Returns MemAvailable from /proc/meminfo in bytes, or None where it can't be read."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:  # Not Linux
+        pass
+    return None
+
+def _cgroup_available() -> Optional[int]:
+    """Returns the memory left under the cgroup limit in bytes, or None if there is no limit."""
+    for limit_file, usage_file in _CGROUP_MEMORY_FILES:
+        try:
+            limit = Path(limit_file).read_text().strip()
+            usage = Path(usage_file).read_text().strip()
+        except OSError:
+            continue
+        if limit == "max":  # v2 without a limit
+            return None
+        return max(0, int(limit) - int(usage))
+    return None
+
+def _available_memory() -> Optional[int]:
+    """
+    Returns the memory available for new processes in bytes, or None where it can't be read.
+
+    In a container /proc/meminfo reports the host's memory, so the cgroup limit is taken when it is lower.
+    """
+    available = [m for m in (_meminfo_available(), _cgroup_available()) if m is not None]
+    return min(available) if available else None
+
+def memory_bounded_pool_size(limit: int, page_cost_mb: int = PAGE_COST_MB) -> int:
+    """Caps limit to the number of pages that fit in the available memory, so rendering doesn't thrash or OOM."""
+    available = _available_memory()
+    if available is None:
+        return limit
+    fits = max(1, available // (page_cost_mb * 1024 * 1024))
+    if fits < limit:
+        logger.info(f"Rendering {fits} pages at a time instead of {limit}, "
+                    f"{available // (1024 * 1024)} MB of memory is available")
+        return fits
+    return limit
+
+async def _block_resources(blocked: Collection[str], route: Route):
+    if route.request.resource_type in blocked:
+        await route.abort()
+    else:
+        await route.continue_()
+
+class BrowserContextPool:
+    """
+    A fixed-size pool of reusable contexts on a shared browser, each with one persistent page.
+
+    Contexts are created lazily, one per slot, and recycled after max_uses pages.
+    Jobs navigate the slot's page instead of opening a new one per URL. A slot whose
+    job raised is closed and replaced with a fresh context and page on its next acquire.
+    Requests for blocked_resource_types are aborted in every pooled context.
+    """
+
+    def __init__(self, browser: Browser, size: int, storage_state: Optional[Path] = None,
+                 max_uses: int = CONTEXT_MAX_PAGES,
+                 blocked_resource_types: Collection[str] = BLOCKED_RESOURCE_TYPES):
+        self.browser = browser
+        self.max_uses = max_uses
+        self.blocked_resource_types = blocked_resource_types
+        self.storage_state = resolve_storage_state(storage_state)
+        self._open: Set[BrowserContext] = set()
+        self._idle: asyncio.Queue[Tuple[Optional[BrowserContext], Optional[Page], int]] = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait((None, None, 0))
+
+    async def _discard(self, context: BrowserContext):
+        self._open.discard(context)
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"Failed to close browser context: {e}")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[Page, None]:
+        """Waits for a free slot and provides its page, creating the context and page if needed."""
+        context, page, uses = await self._idle.get()
+        try:
+            if context is not None and uses >= self.max_uses:
+                await self._discard(context)
+                context = None
+            if context is None:
+                # Service workers would serve requests from their own cache, bypassing the resource routing
+                context = await self.browser.new_context(storage_state=self.storage_state, service_workers="block")
+                self._open.add(context)
+                uses = 0
+                if self.blocked_resource_types:
+                    await context.route("**/*", partial(_block_resources, self.blocked_resource_types))
+                page = await context.new_page()
+            yield page
+            uses += 1
+        except BaseException:
+            # Closing the context closes its page as well
+            if context is not None:
+                await self._discard(context)
+            context, page = None, None
+            raise
+        finally:
+            self._idle.put_nowait((context, page, uses))
+
+    async def close(self):
+        for context in list(self._open):
+            await self._discard(context)
+
+    async def __aenter__(self) -> "BrowserContextPool":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+class open_page:
     """An async context manager to provide a Playwright page.
 
     It opens a new page and ensures it's closed upon exit.
+    Implemented directly rather than with @asynccontextmanager, so entering it doesn't
+    go through a generator.
     """
-    page: Page | None = None
-    try:
-        page = await context.new_page()
-        yield page
-    finally:
-        if page is not None and not page.is_closed():
-            await page.close()
+
+    def __init__(self, context: BrowserContext):
+        self.context = context
+        self.page: Page | None = None
+
+    async def __aenter__(self) -> Page:
+        self.page = await self.context.new_page()
+        return self.page
+
+    async def __aexit__(self, *exc_info):
+        if self.page is not None and not self.page.is_closed():
+            await self.page.close()
 
 async def run_browser():
     async with async_playwright() as p:
-        async with get_browser_context(p, headless=False, storage_state=STATE_FILE, save_on_exit=True) as context:
+        async with get_browser(p, headless=False) as browser, \
+                get_context(browser, storage_state=STATE_FILE, save_on_exit=True) as context:
             async with open_page(context) as page:
                 await page.pause()
 
@@ -82,19 +245,15 @@ async def run_browser_auth():
     from playwright.async_api import async_playwright
     async with async_playwright() as p:
         # Create context with save on exit
-        async with get_browser_context(p, headless=False, storage_state=STATE_FILE, save_on_exit=True) as context:
+        async with get_browser(p, headless=False) as browser, \
+                get_context(browser, storage_state=STATE_FILE, save_on_exit=True) as context:
             page = await context.new_page()
             await page.goto("https://google.com")  # Just a dummy start
             logger.info("Browser open. Please navigate to target, login, then CLOSE THE BROWSER WINDOW.")
 
-            # Wait for the context to close (user closes window)
-            # Since context manager handles close on exit of block, we wait indefinitely?
-            # No, playwright script usually pauses.
-            # A simple way is to poll or wait for closed.
-            try:
-                await page.pause()  # This opens inspector and waits
-            except Exception:
-                pass
+            # Wait for the user to close the window, without the Playwright Inspector.
+            # The page closes but the context stays open, so get_context can still save its state.
+            await page.wait_for_event("close", timeout=0)
 
 if __name__ == "__main__":
-    asyncio.run(run_browser())
+    asyncio.run(run_browser(), loop_factory=new_event_loop)